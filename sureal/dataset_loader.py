@@ -20,21 +20,131 @@ Example JSON dataset structure:
 }
 """
 
+import array
+import importlib.machinery
+import importlib.util
 import json
+import math
+import mmap
 import os
+import pickle
+import sys
+import types
 from argparse import Namespace
-from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Tuple,
+                    Union)
+
+import numpy as np
+
+try:
+    import yaml
+    # prefer the libyaml-backed loader; fall back to the pure-Python one
+    try:
+        from yaml import CSafeLoader as _YamlLoader
+    except ImportError:
+        from yaml import SafeLoader as _YamlLoader
+except ImportError:
+    yaml = None
+    _YamlLoader = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 __copyright__ = "Copyright 2016-2018, Netflix, Inc."
 __license__ = "Apache, Version 2.0"
 
 
+# Value types that may appear at the top level of a saved JSON dataset
+_JSON_TYPES = (str, int, float, bool, type(None), list, tuple, dict)
+
+# Value types of the top-level fields kept by load_dataset_header
+_HEADER_TYPES = (str, int, float, bool, type(None))
+
+# JSON files at least this large are memory-mapped rather than read
+_MMAP_MIN_SIZE = 256 * 1024
+
+# bytes.translate table mapping digits to b'0' and other bytes to b' ', so
+# that integers beyond 64 bits (20 digits or more) show up as _DIGIT_RUN
+_DIGIT_TABLE = bytes(b'0'[0] if b'0'[0] <= i <= b'9'[0] else b' '[0]
+                     for i in range(256))
+_DIGIT_RUN = b'0' * 20
+
+# load_dataset(..., streaming=True) streams JSON files at least this large
+_STREAMING_MIN_SIZE = 128 * 1024 * 1024
+
+# int8 value marking a NaN score in a quantized SoaDataset.os_matrix
+_INT8_MISSING = -128
+
+# Required fields of each entry in ref_videos and dis_videos
+_REF_REQUIRED = frozenset(('content_id', 'path'))
+_DIS_REQUIRED = frozenset(('asset_id', 'content_id', 'path', 'os'))
+
+# Allowed types of the 'os' field of a dis_videos entry
+_OS_TYPES = (list, tuple, dict)
+
+
 class DatasetValidationError(Exception):
     """Raised when dataset validation fails."""
     pass
 
 
+def _in_file(filepath: Optional[str]) -> str:
+    """Location suffix for validation error messages."""
+    return f" in {filepath}" if filepath else ""
+
+
+def _validate_video_lists(data: Dict[str, Any], filepath: Optional[str]) -> None:
+    # Check required fields
+    if 'ref_videos' not in data:
+        raise DatasetValidationError(
+            f"Missing required field 'ref_videos'{_in_file(filepath)}")
+    if 'dis_videos' not in data:
+        raise DatasetValidationError(
+            f"Missing required field 'dis_videos'{_in_file(filepath)}")
+
+    if not isinstance(data['ref_videos'], list):
+        raise DatasetValidationError(
+            f"'ref_videos' must be a list{_in_file(filepath)}")
+    if not isinstance(data['dis_videos'], list):
+        raise DatasetValidationError(
+            f"'dis_videos' must be a list{_in_file(filepath)}")
+
+
+def _validate_ref_video(i: int, ref_video: Any, filepath: Optional[str]) -> None:
+    if not isinstance(ref_video, dict):
+        raise DatasetValidationError(
+            f"ref_videos[{i}] must be a dict{_in_file(filepath)}")
+    if not ref_video.keys() >= _REF_REQUIRED:
+        field = min(_REF_REQUIRED - ref_video.keys())
+        raise DatasetValidationError(
+            f"ref_videos[{i}] missing required field '{field}'{_in_file(filepath)}")
+
+
+def _validate_dis_video(i: int, dis_video: Any, filepath: Optional[str]) -> None:
+    if not isinstance(dis_video, dict):
+        raise DatasetValidationError(
+            f"dis_videos[{i}] must be a dict{_in_file(filepath)}")
+    if not dis_video.keys() >= _DIS_REQUIRED:
+        field = min(_DIS_REQUIRED - dis_video.keys())
+        raise DatasetValidationError(
+            f"dis_videos[{i}] missing required field '{field}'{_in_file(filepath)}")
+
+    # Validate 'os' field structure
+    if not isinstance(dis_video['os'], _OS_TYPES):
+        raise DatasetValidationError(
+            f"dis_videos[{i}]['os'] must be a list, tuple, or dict"
+            f"{_in_file(filepath)}")
+
+
 def validate_dataset(data: Dict[str, Any], filepath: Optional[str] = None) -> None:
     """
     Validate that a dataset dictionary has the required structure.
@@ -51,53 +161,376 @@ def validate_dataset(data: Dict[str, Any], filepath: Optional[str] = None) -> No
     Raises:
         DatasetValidationError: If validation fails
     """
-    source = f" in {filepath}" if filepath else ""
+    _validate_video_lists(data, filepath)
 
-    # Check required fields
-    if 'ref_videos' not in data:
-        raise DatasetValidationError(f"Missing required field 'ref_videos'{source}")
-    if 'dis_videos' not in data:
-        raise DatasetValidationError(f"Missing required field 'dis_videos'{source}")
+    # Check all entries with one expression each; only if that fails, go
+    # through them one by one to report the first invalid entry
+    ref_videos = data['ref_videos']
+    if not all(isinstance(ref_video, dict)
+               and ref_video.keys() >= _REF_REQUIRED
+               for ref_video in ref_videos):
+        for i, ref_video in enumerate(ref_videos):
+            _validate_ref_video(i, ref_video, filepath)
 
-    # Validate ref_videos
-    if not isinstance(data['ref_videos'], list):
-        raise DatasetValidationError(f"'ref_videos' must be a list{source}")
-
-    for i, ref_video in enumerate(data['ref_videos']):
-        if not isinstance(ref_video, dict):
-            raise DatasetValidationError(
-                f"ref_videos[{i}] must be a dict{source}")
-        for field in ['content_id', 'path']:
-            if field not in ref_video:
-                raise DatasetValidationError(
-                    f"ref_videos[{i}] missing required field '{field}'{source}")
-
-    # Validate dis_videos
-    if not isinstance(data['dis_videos'], list):
-        raise DatasetValidationError(f"'dis_videos' must be a list{source}")
-
-    for i, dis_video in enumerate(data['dis_videos']):
-        if not isinstance(dis_video, dict):
-            raise DatasetValidationError(
-                f"dis_videos[{i}] must be a dict{source}")
-        for field in ['asset_id', 'content_id', 'path', 'os']:
-            if field not in dis_video:
-                raise DatasetValidationError(
-                    f"dis_videos[{i}] missing required field '{field}'{source}")
-
-        # Validate 'os' field structure
+    dis_videos = data['dis_videos']
+    if not all(isinstance(dis_video, dict)
+               and dis_video.keys() >= _DIS_REQUIRED
+               and isinstance(dis_video['os'], _OS_TYPES)
+               for dis_video in dis_videos):
+        for i, dis_video in enumerate(dis_videos):
+            _validate_dis_video(i, dis_video, filepath)
+
+
+class Dataset(object):
+    """
+    Container for a dataset loaded from JSON or YAML.
+
+    The common fields are stored in slots; any other top-level field is kept
+    in an extras dict and is still accessible as an attribute. Fields that
+    are absent from the file are absent from the object, like with
+    argparse.Namespace, so hasattr() can be used to test for them.
+    __dict__ returns a fresh dict of all fields for code that treats
+    datasets as plain objects.
+    """
+
+    __slots__ = ('dataset_name', 'ref_score', 'ref_videos', 'dis_videos',
+                 'yuv_fmt', 'width', 'height', '_extras')
+    _SLOT_NAMES = frozenset(__slots__)
+
+    def __init__(self, **kwargs):
+        object.__setattr__(self, '_extras', {})
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def __getattr__(self, name):
+        # only called when the attribute is not found in a slot
+        if name == '_extras':
+            raise AttributeError(name)
+        try:
+            return self._extras[name]
+        except KeyError:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __setattr__(self, name, value):
+        if name in self._SLOT_NAMES:
+            object.__setattr__(self, name, value)
+        else:
+            self._extras[name] = value
+
+    def __delattr__(self, name):
+        if name in self._SLOT_NAMES:
+            object.__delattr__(self, name)
+        else:
+            try:
+                del self._extras[name]
+            except KeyError:
+                raise AttributeError(name)
+
+    @property
+    def __dict__(self) -> Dict[str, Any]:
+        d = {}
+        for key in Dataset.__slots__[:-1]:
+            try:
+                d[key] = object.__getattribute__(self, key)
+            except AttributeError:
+                pass
+        d.update(self._extras)
+        return d
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return self.__dict__
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, key)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Dataset):
+            return NotImplemented
+        return self.__dict__ == other.__dict__
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{key}={value!r}'
+                           for key, value in self.__dict__.items())
+        return f'{type(self).__name__}({fields})'
+
+
+class SoaDataset(Dataset):
+    """
+    Dataset whose dis_videos are stored column-wise (structure of arrays),
+    as returned by load_dataset(..., layout='soa'):
+
+    - asset_ids, content_ids: array.array('q')
+    - paths: tuple of str
+    - os_subjects: tuple of subject names when 'os' is a dict, else None
+    - os_matrix: numpy array of shape (num_dis_videos, num_subjects)
+
+    With load_dataset(..., quantize='auto'), os_matrix is stored as int8 or
+    float16 when that is lossless. For int8, a score is
+    os_matrix * os_scale + os_offset, and -128 marks a NaN score.
+    os_scores() returns the scores in their original dtype either way.
+
+    dis_videos is still available as a list of dicts; it is built from the
+    columns on first access. The columns reflect the dataset as loaded and
+    are not updated when dis_videos is modified or reassigned.
+    """
+
+    __slots__ = ('asset_ids', 'content_ids', 'paths', 'os_subjects',
+                 'os_matrix', 'os_scale', 'os_offset', '_os_dtype',
+                 '_other_columns', '_dis_videos')
+    _SLOT_NAMES = Dataset._SLOT_NAMES | frozenset(__slots__)
+
+    def __init__(self, **kwargs):
+        object.__setattr__(self, 'os_scale', 1.0)
+        object.__setattr__(self, 'os_offset', 0.0)
+        object.__setattr__(self, '_os_dtype', None)
+        object.__setattr__(self, '_dis_videos', None)
+        object.__setattr__(self, '_other_columns', {})
+        super().__init__(**kwargs)
+
+    def os_scores(self) -> np.ndarray:
+        """Return os_matrix with any quantization undone."""
+        if self._os_dtype is None:
+            return self.os_matrix
+        return _dequantize_scores(self.os_matrix, self.os_scale,
+                                  self.os_offset, self._os_dtype)
+
+    @property
+    def dis_videos(self) -> List[Dict[str, Any]]:
+        if self._dis_videos is None:
+            self._dis_videos = self._build_dis_videos()
+        return self._dis_videos
+
+    @dis_videos.setter
+    def dis_videos(self, value: List[Dict[str, Any]]) -> None:
+        self._dis_videos = value
+
+    def _build_dis_videos(self) -> List[Dict[str, Any]]:
+        rows = self.os_scores().tolist()
+        if self.os_subjects is not None:
+            rows = [dict(zip(self.os_subjects, row)) for row in rows]
+        dis_videos = [
+            {'asset_id': asset_id, 'content_id': content_id, 'path': path,
+             'os': os_field}
+            for asset_id, content_id, path, os_field
+            in zip(self.asset_ids, self.content_ids, self.paths, rows)
+        ]
+        for key, column in self._other_columns.items():
+            for dis_video, value in zip(dis_videos, column):
+                dis_video[key] = value
+        return dis_videos
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {}
+        for key in self._SLOT_NAMES - {'dis_videos', '_extras'}:
+            try:
+                state[key] = object.__getattribute__(self, key)
+            except AttributeError:
+                pass
+        state.update(self._extras)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__()
+        for key, value in state.items():
+            setattr(self, key, value)
+
+
+# Attributes that SoaDataset adds to Dataset
+_SOA_COLUMNS = SoaDataset._SLOT_NAMES - Dataset._SLOT_NAMES
+
+
+def _same_scores(scores: np.ndarray, other: np.ndarray) -> bool:
+    """Whether two score matrices are equal, NaN matching NaN."""
+    return bool(np.all((scores == other)
+                       | (np.isnan(scores) & np.isnan(other))))
+
+
+def _quantize_scores(scores: np.ndarray) -> Optional[Tuple[np.ndarray, float, float]]:
+    """
+    Find a lossless compact representation of a score matrix: int8 with a
+    scale of 1 or 0.5 and an offset (NaN stored as -128), or else float16.
+    Returns (quantized, scale, offset), or None if neither is lossless.
+    """
+    values = scores.astype(np.float64)
+    present = ~np.isnan(values)
+    for scale in (1.0, 0.5):
+        steps = values[present] / scale
+        if not np.array_equal(steps, np.round(steps)):
+            continue
+        low = steps.min() if steps.size else 0.0
+        high = steps.max() if steps.size else 0.0
+        if high - low > 254:
+            continue
+        offset = 0.0 if low >= -127 and high <= 127 else low + 127
+        quantized = np.full(values.shape, _INT8_MISSING, dtype=np.int8)
+        quantized[present] = steps - offset
+        # beyond 2 ** 53, neither float64 nor the int8 steps are exact
+        if _same_scores(_dequantize_scores(quantized, scale, offset * scale,
+                                           scores.dtype), scores):
+            return quantized, scale, offset * scale
+        break
+
+    if present.any() and np.abs(values[present]).max() > np.finfo(np.float16).max:
+        return None
+    quantized = values.astype(np.float16)
+    if _same_scores(_dequantize_scores(quantized, 1.0, 0.0, scores.dtype),
+                    scores):
+        return quantized, 1.0, 0.0
+    return None
+
+
+def _dequantize_scores(quantized: np.ndarray, scale: float, offset: float,
+                       dtype: np.dtype) -> np.ndarray:
+    """Undo _quantize_scores, returning scores of the given dtype."""
+    if quantized.dtype == np.int8:
+        scores = quantized * scale + offset
+        scores[quantized == _INT8_MISSING] = np.nan
+    else:
+        scores = quantized.astype(np.float64)
+    return scores.astype(dtype)
+
+
+def _to_soa(dataset: Dataset, quantize: bool = False) -> Optional[SoaDataset]:
+    """
+    Convert a Dataset to a SoaDataset, optionally quantizing the scores.
+    The SoaDataset shares the values of all other fields with dataset.
+    Returns None if a top-level field has the name of a SoaDataset column,
+    or if dis_videos is not uniform: all entries must have the same fields
+    and the same subjects, with integer asset and content ids and one number
+    per subject, all scores being of the same type.
+    """
+    dis_videos = dataset.dis_videos
+    if not dis_videos or not _SOA_COLUMNS.isdisjoint(dataset.__dict__):
+        return None
+    keys = dis_videos[0].keys()
+    os_field = dis_videos[0]['os']
+    if isinstance(os_field, dict):
+        subjects = tuple(os_field)
+        subject_keys = os_field.keys()
+        for dis_video in dis_videos:
+            if dis_video.keys() != keys:
+                return None
+            os_field = dis_video['os']
+            if not isinstance(os_field, dict) or os_field.keys() != subject_keys:
+                return None
+    else:
+        subjects = None
+        for dis_video in dis_videos:
+            if dis_video.keys() != keys:
+                return None
+    try:
+        asset_ids = array.array('q', [v['asset_id'] for v in dis_videos])
+        content_ids = array.array('q', [v['content_id'] for v in dis_videos])
+    except (TypeError, OverflowError):
+        return None
+    if subjects is not None:
+        rows = [[v['os'][subject] for subject in subjects] for v in dis_videos]
+    else:
+        rows = [v['os'] for v in dis_videos]
+    try:
+        os_matrix = np.array(rows)
+    except ValueError:
+        # rows of different lengths
+        return None
+    if os_matrix.ndim != 2 or os_matrix.dtype.kind not in 'if':
+        # e.g. scores with repetitions, or non-numeric scores
+        return None
+    if len({type(score) for row in rows for score in row}) > 1:
+        # e.g. integer scores with a NaN: the matrix would turn them into
+        # floats, and dis_videos would not be rebuilt as loaded
+        return None
+
+    fields = dataset.__dict__
+    del fields['dis_videos']
+    ret = SoaDataset(**fields)
+    ret.asset_ids = asset_ids
+    ret.content_ids = content_ids
+    ret.paths = tuple(v['path'] for v in dis_videos)
+    ret.os_subjects = subjects
+    ret.os_matrix = os_matrix
+    if quantize:
+        quantized = _quantize_scores(os_matrix)
+        if quantized is not None:
+            ret.os_matrix, ret.os_scale, ret.os_offset = quantized
+            ret._os_dtype = os_matrix.dtype
+    ret._other_columns = {
+        key: tuple(v[key] for v in dis_videos)
+        for key in keys if key not in _DIS_REQUIRED
+    }
+    return ret
+
+
+def _intern_os_keys(dis_videos: List[Dict[str, Any]]) -> None:
+    """
+    Intern the subject names used as 'os' keys, so that each name is stored
+    once rather than once per distorted video.
+    """
+    intern = sys.intern
+    for dis_video in dis_videos:
         os_field = dis_video['os']
-        if not isinstance(os_field, (list, tuple, dict)):
-            raise DatasetValidationError(
-                f"dis_videos[{i}]['os'] must be a list, tuple, or dict{source}")
+        if isinstance(os_field, dict):
+            dis_video['os'] = {
+                intern(key) if isinstance(key, str) else key: value
+                for key, value in os_field.items()
+            }
+
+
+def _dict_to_dataset(data: Dict[str, Any]) -> Dataset:
+    """Convert a dictionary to a Dataset object."""
+    return Dataset(**data)
+
+
+def _has_long_digit_run(buf: Any) -> bool:
+    # translate in chunks (overlapping by one digit less than a run) to
+    # bound the size of the translated copy for memory-mapped files
+    chunk_size = 1024 * 1024
+    overlap = len(_DIGIT_RUN) - 1
+    for start in range(0, len(buf), chunk_size):
+        chunk = bytes(buf[start:start + chunk_size + overlap])
+        if _DIGIT_RUN in chunk.translate(_DIGIT_TABLE):
+            return True
+    return False
 
 
-def _dict_to_namespace(data: Dict[str, Any]) -> Namespace:
-    """Convert a dictionary to an argparse.Namespace object."""
-    return Namespace(**data)
+def _orjson_loads(buf: Any) -> Any:
+    if _has_long_digit_run(buf):
+        # orjson turns integers beyond 64 bits into floats; json keeps them
+        return json.loads(bytes(buf))
+    try:
+        return orjson.loads(buf)
+    except orjson.JSONDecodeError:
+        # orjson rejects the NaN/Infinity literals that json accepts
+        return json.loads(bytes(buf))
+
+
+def _read_json(filepath: str) -> Any:
+    """Parse a JSON file, using orjson when available."""
+    if orjson is not None:
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+                return _orjson_loads(f.read())
+            # parse large files straight from the page cache instead of
+            # copying them into a bytes object first
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as buf:
+                    return _orjson_loads(buf)
+    with open(filepath, 'r') as f:
+        return json.load(f)
+
+
+def _require_yaml() -> None:
+    if yaml is None:
+        raise ImportError(
+            "PyYAML is required to load YAML datasets. "
+            "Install it with: pip install pyyaml"
+        )
 
 
-def load_json_dataset(filepath: str) -> Namespace:
+def load_json_dataset(filepath: str) -> Dataset:
     """
     Load a dataset from a JSON file.
 
@@ -105,16 +538,93 @@ def load_json_dataset(filepath: str) -> Namespace:
         filepath: Path to the JSON file
 
     Returns:
-        Namespace object containing the dataset
+        Dataset object containing the dataset
     """
-    with open(filepath, 'r') as f:
-        data = json.load(f)
+    data = _read_json(filepath)
 
     validate_dataset(data, filepath)
-    return _dict_to_namespace(data)
+    _intern_os_keys(data['dis_videos'])
+    return _dict_to_dataset(data)
 
 
-def load_yaml_dataset(filepath: str) -> Namespace:
+def load_json_dataset_streaming(filepath: str) -> Dataset:
+    """
+    Load a dataset from a JSON file, parsing it incrementally with ijson.
+
+    Unlike load_json_dataset, the file is never held in memory as a whole:
+    each ref_videos/dis_videos entry is built and validated as soon as it
+    has been read, which bounds peak memory for very large datasets. Dict
+    keys are interned as they are read, rather than in a separate pass.
+
+    Args:
+        filepath: Path to the JSON file
+
+    Returns:
+        Dataset object containing the dataset
+
+    Raises:
+        ImportError: If ijson is not installed
+    """
+    if ijson is None:
+        raise ImportError(
+            "ijson is required to stream JSON datasets. "
+            "Install it with: pip install ijson"
+        )
+
+    intern = sys.intern
+    validators = {
+        'ref_videos': _validate_ref_video,
+        'dis_videos': _validate_dis_video,
+    }
+    data = {}
+    key = None
+    videos = None  # list currently being filled, if any
+    builder = None  # builder of the value currently being read, if any
+    builder_prefix = None
+    try:
+        with open(filepath, 'rb') as f:
+            for prefix, event, value in ijson.parse(f, use_float=True):
+                if builder is not None:
+                    if event == 'map_key':
+                        value = intern(value)
+                    builder.event(event, value)
+                    if prefix == builder_prefix and event in ('end_map',
+                                                              'end_array'):
+                        value = builder.value
+                        builder = None
+                    else:
+                        continue
+                elif prefix == '':
+                    if event == 'map_key':
+                        key = value
+                    continue
+                elif prefix == key and key in validators:
+                    if videos is None and event == 'start_array':
+                        videos = data[key] = []
+                        continue
+                    if videos is not None and event == 'end_array':
+                        videos = None
+                        continue
+
+                if event in ('start_map', 'start_array'):
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                    builder_prefix = prefix
+                elif videos is not None:
+                    validators[key](len(videos), value, filepath)
+                    videos.append(value)
+                else:
+                    data[key] = value
+    except ijson.JSONError:
+        # e.g. NaN literals, which json accepts but ijson does not
+        return load_json_dataset(filepath)
+
+    # the entries have been validated and their keys interned while reading
+    _validate_video_lists(data, filepath)
+    return _dict_to_dataset(data)
+
+
+def load_yaml_dataset(filepath: str) -> Dataset:
     """
     Load a dataset from a YAML file.
 
@@ -122,24 +632,19 @@ def load_yaml_dataset(filepath: str) -> Namespace:
         filepath: Path to the YAML file
 
     Returns:
-        Namespace object containing the dataset
+        Dataset object containing the dataset
 
     Raises:
         ImportError: If PyYAML is not installed
     """
-    try:
-        import yaml
-    except ImportError:
-        raise ImportError(
-            "PyYAML is required to load YAML datasets. "
-            "Install it with: pip install pyyaml"
-        )
+    _require_yaml()
 
     with open(filepath, 'r') as f:
-        data = yaml.safe_load(f)
+        data = yaml.load(f, Loader=_YamlLoader)
 
     validate_dataset(data, filepath)
-    return _dict_to_namespace(data)
+    _intern_os_keys(data['dis_videos'])
+    return _dict_to_dataset(data)
 
 
 def load_python_dataset(filepath: str) -> Any:
@@ -162,16 +667,79 @@ def load_python_dataset(filepath: str) -> Any:
     from sureal.tools.misc import get_file_name_without_extension
 
     filename = get_file_name_without_extension(filepath)
-    try:
-        from importlib.machinery import SourceFileLoader
-        ret = SourceFileLoader(filename, filepath).load_module()
-    except ImportError:
-        import imp
-        ret = imp.load_source(filename, filepath)
+    # an explicit loader also accepts files not ending in (lowercase) .py
+    spec = importlib.util.spec_from_file_location(
+        filename, filepath,
+        loader=importlib.machinery.SourceFileLoader(filename, filepath))
+    ret = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ret)
     return ret
 
 
-def load_dataset(filepath: str) -> Union[Namespace, Any]:
+# Dataset loader per (lowercase) file extension
+_LOADERS = {
+    '.json': load_json_dataset,
+    '.yaml': load_yaml_dataset,
+    '.yml': load_yaml_dataset,
+    '.py': load_python_dataset,
+}
+_SUPPORTED_EXTS = ', '.join(_LOADERS)
+
+
+def _copy_value(value: Any) -> Any:
+    """Copy the lists, tuples and dicts of a value recursively."""
+    value_type = type(value)
+    if value_type is list:
+        return [_copy_value(item) for item in value]
+    if value_type is dict:
+        return {key: _copy_value(item) for key, item in value.items()}
+    if value_type is tuple:
+        return tuple(_copy_value(item) for item in value)
+    return value
+
+
+def _copy_module(module: types.ModuleType) -> types.ModuleType:
+    """
+    Copy a cached Python dataset so that callers can modify the returned
+    module and the lists and dicts in it (down to the scores of each video)
+    without affecting the cache.
+    """
+    ret = types.ModuleType(module.__name__)
+    # leave __builtins__ and the like alone
+    ret.__dict__.update({
+        key: value if key.startswith('__') else _copy_value(value)
+        for key, value in module.__dict__.items()
+    })
+    return ret
+
+
+@lru_cache(maxsize=32)
+def _load_cached(loader: Callable[[str], Any], filepath: str,
+                 mtime_ns: int, size: int) -> Union[bytes, types.ModuleType]:
+    """
+    Load a dataset; mtime_ns and size only serve as cache key.
+
+    A Dataset is kept pickled: unpickling it gives each caller an independent
+    copy faster than copying the objects in Python, or than parsing the file
+    again. Python modules can hold objects that do not pickle and are kept
+    as they are.
+
+    Unpickling keeps each subject name used as 'os' key stored once per
+    dataset, but the names are new strings on every load rather than the
+    interned ones: interning them again would cost more than unpickling.
+
+    The cache lives in the process only. Validation results are not kept on
+    disk across processes: hashing a file to recognize it costs several
+    times more than validating it again.
+    """
+    dataset = loader(filepath)
+    if isinstance(dataset, Dataset):
+        return pickle.dumps(dataset.__dict__, protocol=pickle.HIGHEST_PROTOCOL)
+    return dataset
+
+
+def load_dataset(filepath: str, streaming: bool = False, layout: str = 'aos',
+                 quantize: str = 'none') -> Union[Dataset, Any]:
     """
     Load a dataset from any supported format.
 
@@ -180,49 +748,244 @@ def load_dataset(filepath: str) -> Union[Namespace, Any]:
     - .yaml, .yml: YAML format
     - .py: Python module format (legacy)
 
+    Loaded datasets are cached, keyed by path, modification time and size, so
+    repeated loads of an unchanged file skip parsing, validation and, for
+    Python datasets, executing the module. Each call returns an independent
+    copy of the dataset, including its video lists and scores; use
+    load_dataset.cache_clear() to empty the cache.
+
     Args:
         filepath: Path to the dataset file
+        streaming: If True, JSON files of 128 MiB or more are parsed
+            incrementally with load_json_dataset_streaming (requires ijson)
+            to limit peak memory; smaller files are loaded as usual
+        layout: 'aos' (default) to get dis_videos as a list of dicts, or
+            'soa' to get a JSON/YAML dataset as a SoaDataset, with dis_videos
+            also stored column-wise; datasets whose dis_videos are not
+            uniform, or with a top-level field named like a SoaDataset
+            column, are returned as a Dataset
+        quantize: 'none' (default) or 'auto' to store the os_matrix of a
+            SoaDataset as int8 or float16 when that is lossless; only used
+            with layout='soa'
 
     Returns:
-        Dataset object (Namespace for JSON/YAML, module for Python)
+        Dataset object (Dataset for JSON/YAML, module for Python)
 
     Raises:
-        ValueError: If the file format is not supported
+        ValueError: If the file format, layout or quantize is not supported
         FileNotFoundError: If the file does not exist
         DatasetValidationError: If the dataset structure is invalid
     """
-    if not os.path.exists(filepath):
+    if layout not in ('aos', 'soa'):
+        raise ValueError(f"Unsupported layout: {layout}. "
+                         f"Supported layouts: aos, soa")
+    if quantize not in ('none', 'auto'):
+        raise ValueError(f"Unsupported quantize: {quantize}. "
+                         f"Supported values: none, auto")
+
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
         raise FileNotFoundError(f"Dataset file not found: {filepath}")
 
-    ext = Path(filepath).suffix.lower()
+    ext = os.path.splitext(filepath)[1].lower()
 
-    loaders = {
-        '.json': load_json_dataset,
-        '.yaml': load_yaml_dataset,
-        '.yml': load_yaml_dataset,
-        '.py': load_python_dataset,
-    }
+    loader = _LOADERS.get(ext)
+    if loader is None:
+        raise ValueError(
+            f"Unsupported dataset format: {ext}. "
+            f"Supported formats: {_SUPPORTED_EXTS}"
+        )
+    if (streaming and loader is load_json_dataset
+            and st.st_size >= _STREAMING_MIN_SIZE):
+        loader = load_json_dataset_streaming
+
+    cached = _load_cached(loader, os.path.abspath(filepath),
+                          st.st_mtime_ns, st.st_size)
+    if not isinstance(cached, bytes):
+        return _copy_module(cached)
+
+    dataset = Dataset(**pickle.loads(cached))
+    if layout == 'soa':
+        soa_dataset = _to_soa(dataset, quantize=(quantize == 'auto'))
+        if soa_dataset is not None:
+            return soa_dataset
+    return dataset
+
+
+load_dataset.cache_clear = _load_cached.cache_clear
+
+
+def load_datasets(filepaths: Iterable[str],
+                  max_workers: Optional[int] = None) -> List[Union[Dataset, Any]]:
+    """
+    Load several datasets concurrently with load_dataset.
+
+    Files are read and parsed on a thread pool. The results are returned in
+    the order of filepaths; if loading any file fails, the exception of the
+    first failing file (in that order) is raised.
 
-    if ext not in loaders:
-        supported = ', '.join(loaders.keys())
+    Args:
+        filepaths: Paths to the dataset files
+        max_workers: Number of threads (default: one per file, at most 32)
+
+    Returns:
+        List of dataset objects, as returned by load_dataset
+    """
+    filepaths = list(filepaths)
+    if not filepaths:
+        return []
+    if max_workers is None:
+        max_workers = min(32, len(filepaths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(load_dataset, filepaths))
+
+
+def _header_from_dict(data: Dict[str, Any]) -> Namespace:
+    header = {key: value for key, value in data.items()
+              if not key.startswith('_') and isinstance(value, _HEADER_TYPES)}
+    for key in ('ref_videos', 'dis_videos'):
+        videos = data.get(key)
+        header['num_' + key] = len(videos) if isinstance(videos, list) else 0
+    return Namespace(**header)
+
+
+def _load_json_header(filepath: str) -> Namespace:
+    if orjson is not None or ijson is None:
+        # orjson builds the whole dataset faster than ijson walks its tokens
+        return _header_from_dict(_read_json(filepath))
+
+    # stream the file: scores are tokenized but never built into objects
+    scalar_events = ('null', 'boolean', 'number', 'string')
+    header = {'num_ref_videos': 0, 'num_dis_videos': 0}
+    try:
+        with open(filepath, 'rb') as f:
+            for prefix, event, value in ijson.parse(f, use_float=True):
+                if prefix in ('ref_videos.item', 'dis_videos.item'):
+                    if event in scalar_events or event in ('start_map',
+                                                           'start_array'):
+                        header['num_' + prefix[:-len('.item')]] += 1
+                elif (event in scalar_events and prefix and '.' not in prefix
+                      and not prefix.startswith('_')):
+                    header[prefix] = value
+    except ijson.JSONError:
+        # e.g. NaN literals, which json accepts
+        return _header_from_dict(_read_json(filepath))
+    return Namespace(**header)
+
+
+def _construct_yaml_scalar(loader: Any, event: Any) -> Any:
+    tag = event.tag
+    if tag is None or tag == '!':
+        tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+    node = yaml.ScalarNode(tag, event.value, style=event.style)
+    return loader.construct_object(node)
+
+
+def _load_yaml_header(filepath: str) -> Namespace:
+    _require_yaml()
+
+    # walk the parser events: nested nodes are skipped without being composed
+    # or constructed, only root scalars are turned into Python values
+    header = {'num_ref_videos': 0, 'num_dis_videos': 0}
+    depth = 0
+    key = None
+    counted = None
+    with open(filepath, 'r') as f:
+        loader = _YamlLoader(f)
+        try:
+            while loader.check_event():
+                event = loader.get_event()
+                if isinstance(event, yaml.CollectionEndEvent):
+                    depth -= 1
+                    if depth == 1:
+                        counted = None
+                    continue
+                if not isinstance(event, yaml.NodeEvent):
+                    continue
+                if depth == 1:
+                    if key is None:
+                        is_scalar = isinstance(event, yaml.ScalarEvent)
+                        key = event.value if is_scalar else ''
+                    else:
+                        if isinstance(event, yaml.ScalarEvent):
+                            if not key.startswith('_'):
+                                header[key] = _construct_yaml_scalar(
+                                    loader, event)
+                        elif (isinstance(event, yaml.SequenceStartEvent)
+                              and key in ('ref_videos', 'dis_videos')):
+                            counted = 'num_' + key
+                        key = None
+                elif depth == 2 and counted is not None:
+                    header[counted] += 1
+                if isinstance(event, yaml.CollectionStartEvent):
+                    depth += 1
+        finally:
+            loader.dispose()
+    return Namespace(**header)
+
+
+def _load_python_header(filepath: str) -> Namespace:
+    return _header_from_dict(dataset_to_dict(load_python_dataset(filepath)))
+
+
+# load_dataset_header counterpart of _LOADERS
+_HEADER_LOADERS = {
+    '.json': _load_json_header,
+    '.yaml': _load_yaml_header,
+    '.yml': _load_yaml_header,
+    '.py': _load_python_header,
+}
+
+
+def load_dataset_header(filepath: str) -> Namespace:
+    """
+    Load only the top-level scalar fields of a dataset (e.g. dataset_name,
+    ref_score, yuv_fmt, width, height) and the number of reference and
+    distorted videos. The dataset is not validated.
+
+    YAML files are read at the parser event level, without building the
+    per-video entries and their opinion scores. JSON files are parsed in full
+    with orjson, which is faster than streaming them; without orjson they are
+    streamed when ijson is installed. Python datasets are loaded in full.
+
+    Args:
+        filepath: Path to the dataset file
+
+    Returns:
+        Namespace with the top-level scalar fields, plus num_ref_videos and
+        num_dis_videos
+
+    Raises:
+        ValueError: If the file format is not supported
+        FileNotFoundError: If the file does not exist
+    """
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"Dataset file not found: {filepath}")
+
+    ext = os.path.splitext(filepath)[1].lower()
+
+    loader = _HEADER_LOADERS.get(ext)
+    if loader is None:
         raise ValueError(
-            f"Unsupported dataset format: {ext}. Supported formats: {supported}"
+            f"Unsupported dataset format: {ext}. "
+            f"Supported formats: {_SUPPORTED_EXTS}"
         )
 
-    return loaders[ext](filepath)
+    return loader(filepath)
 
 
-def dataset_to_dict(dataset: Union[Namespace, Any]) -> Dict[str, Any]:
+def dataset_to_dict(dataset: Union[Dataset, Namespace, Any]) -> Dict[str, Any]:
     """
-    Convert a dataset (Namespace or module) to a dictionary.
+    Convert a dataset (Dataset, Namespace or module) to a dictionary.
 
     Args:
-        dataset: Dataset object (Namespace or Python module)
+        dataset: Dataset object (Dataset, Namespace or Python module)
 
     Returns:
         Dictionary representation of the dataset
     """
-    if isinstance(dataset, Namespace):
+    if isinstance(dataset, (Dataset, Namespace)):
         return vars(dataset)
     else:
         # Python module - extract relevant attributes
@@ -233,13 +996,59 @@ def dataset_to_dict(dataset: Union[Namespace, Any]) -> Dict[str, Any]:
         }
 
 
-def save_dataset_json(dataset: Union[Namespace, Any, Dict], filepath: str,
-                      indent: int = 2) -> None:
+def _has_non_finite(value: Any) -> bool:
+    """Whether value is, or contains, a NaN or infinite float."""
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return (any(_has_non_finite(key) for key in value)
+                or any(_has_non_finite(item) for item in value.values()))
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite(item) for item in value)
+    return False
+
+
+def _write_json(data: Dict[str, Any], filepath: str, indent: int) -> None:
+    """Write a dictionary to a JSON file, using orjson when possible."""
+    if orjson is not None and indent == 2:
+        try:
+            # orjson raises TypeError for datetimes and dataclasses (as json
+            # does) only when told to pass them through
+            out = orjson.dumps(
+                data, option=(orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                              | orjson.OPT_PASSTHROUGH_DATETIME
+                              | orjson.OPT_PASSTHROUGH_DATACLASS))
+        except TypeError:
+            # e.g. integers beyond 64 bits, which json handles, or values that
+            # neither can serialize
+            out = None
+        # orjson writes NaN and Infinity as null; keep json's output in that
+        # case. Without any null in the output there is nothing to check.
+        if out is not None and (b'null' not in out
+                                or not _has_non_finite(data)):
+            with open(filepath, 'wb') as f:
+                f.write(out)
+            return
+
+    with open(filepath, 'w') as f:
+        json.dump(data, f, indent=indent)
+
+
+def _is_json_serializable(value: Any) -> bool:
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def save_dataset_json(dataset: Union[Dataset, Namespace, Any, Dict],
+                      filepath: str, indent: int = 2) -> None:
     """
     Save a dataset to a JSON file.
 
     Args:
-        dataset: Dataset object (Namespace, module, or dict)
+        dataset: Dataset object (Dataset, Namespace, module, or dict)
         filepath: Output file path
         indent: JSON indentation (default 2)
     """
@@ -248,17 +1057,19 @@ def save_dataset_json(dataset: Union[Namespace, Any, Dict], filepath: str,
     else:
         data = dataset_to_dict(dataset)
 
-    # Filter out non-serializable items and internal attributes
-    serializable_data = {}
-    for key, value in data.items():
-        if key.startswith('_'):
-            continue
-        try:
-            json.dumps(value)
-            serializable_data[key] = value
-        except (TypeError, ValueError):
-            # Skip non-serializable values (like module references)
-            pass
+    # Filter out internal attributes and values of non-JSON types (like
+    # module references)
+    serializable_data = {
+        key: value for key, value in data.items()
+        if not key.startswith('_') and isinstance(value, _JSON_TYPES)
+    }
 
-    with open(filepath, 'w') as f:
-        json.dump(serializable_data, f, indent=indent)
+    try:
+        _write_json(serializable_data, filepath, indent)
+    except (TypeError, ValueError):
+        # Some container holds a non-serializable item: probe each value
+        serializable_data = {
+            key: value for key, value in serializable_data.items()
+            if _is_json_serializable(value)
+        }
+        _write_json(serializable_data, filepath, indent)
@@ -1,13 +1,25 @@
+import datetime
+import math
 import os
+import sys
 import tempfile
 import unittest
+import warnings
+from unittest.mock import patch
+
+import numpy as np
 
 from sureal.config import SurealConfig
 from sureal.dataset_loader import (
     load_dataset,
+    load_dataset_header,
+    load_datasets,
     load_json_dataset,
+    load_json_dataset_streaming,
     load_yaml_dataset,
     load_python_dataset,
+    Dataset,
+    SoaDataset,
     validate_dataset,
     DatasetValidationError,
     save_dataset_json,
@@ -26,6 +38,42 @@ class DatasetLoaderTest(unittest.TestCase):
         self.assertEqual(len(dataset.dis_videos), 3)
         self.assertEqual(dataset.ref_score, 5.0)
 
+    def test_load_json_dataset_extra_fields(self):
+        """Test that fields without a slot are kept as attributes."""
+        filepath = SurealConfig.test_resource_path('NFLX_dataset_public_raw.json')
+        dataset = load_json_dataset(filepath)
+        self.assertIsInstance(dataset, Dataset)
+        self.assertEqual(dataset.ref_dir, '[path to dataset videos]/ref')
+        self.assertIn('ref_dir', vars(dataset))
+        self.assertFalse(hasattr(dataset, 'quality_width'))
+        dataset.quality_width = 1920
+        self.assertEqual(dataset.quality_width, 1920)
+        self.assertEqual(dataset.__dict__['quality_width'], 1920)
+
+    def test_load_json_dataset_streaming(self):
+        """Test that streaming and eager JSON loading agree."""
+        for name in ['NFLX_dataset_public_raw.json',
+                     'test_dataset_os_as_dict.json',
+                     'test_dataset_os_as_list_with_repetitions.json']:
+            filepath = SurealConfig.test_resource_path(name)
+            self.assertEqual(load_json_dataset_streaming(filepath),
+                             load_json_dataset(filepath))
+
+    def test_load_json_dataset_streaming_invalid(self):
+        """Test that streamed entries are validated."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json',
+                                         delete=False) as f:
+            f.write('{"ref_videos": [{"content_id": 0, "path": "ref.yuv"}], '
+                    '"dis_videos": [{"asset_id": 0, "content_id": 0, '
+                    '"path": "dis.yuv"}]}')
+            filepath = f.name
+        try:
+            with self.assertRaisesRegex(DatasetValidationError,
+                                        r"dis_videos\[0\] missing required field 'os'"):
+                load_json_dataset_streaming(filepath)
+        finally:
+            os.unlink(filepath)
+
     def test_load_yaml_dataset(self):
         """Test loading a YAML dataset."""
         filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.yaml')
@@ -35,6 +83,14 @@ class DatasetLoaderTest(unittest.TestCase):
         self.assertEqual(len(dataset.dis_videos), 3)
         self.assertEqual(dataset.ref_score, 5.0)
 
+    def test_load_yaml_dataset_interns_os_keys(self):
+        """Test that subject names are shared across dis_videos."""
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.yaml')
+        dataset = load_yaml_dataset(filepath)
+        keys = [sorted(dis_video['os']) for dis_video in dataset.dis_videos]
+        for key0, key1 in zip(keys[0], keys[1]):
+            self.assertIs(key0, key1)
+
     def test_load_python_dataset(self):
         """Test loading a Python dataset."""
         filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.py')
@@ -43,6 +99,32 @@ class DatasetLoaderTest(unittest.TestCase):
         self.assertEqual(len(dataset.ref_videos), 2)
         self.assertEqual(len(dataset.dis_videos), 3)
 
+    def test_load_python_dataset_not_registered(self):
+        """Test that loading a Python dataset leaves sys.modules alone."""
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict2.py')
+        dataset = load_python_dataset(filepath)
+        self.assertNotIn(dataset.__name__, sys.modules)
+        self.assertIsNot(load_python_dataset(filepath), dataset)
+
+    def test_load_python_dataset_other_suffix(self):
+        """Test loading a Python dataset whose suffix is not .py."""
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.py')
+        with open(filepath) as f:
+            source = f.read()
+        for suffix in ('.PY', '.txt'):
+            with tempfile.NamedTemporaryFile(mode='w', suffix=suffix,
+                                             delete=False) as f:
+                f.write(source)
+                temp_path = f.name
+            try:
+                dataset = load_python_dataset(temp_path)
+                self.assertEqual(len(dataset.dis_videos), 3)
+                if suffix == '.PY':
+                    self.assertEqual(len(load_dataset(temp_path).dis_videos), 3)
+            finally:
+                os.unlink(temp_path)
+                load_dataset.cache_clear()
+
     def test_load_dataset_auto_detect_json(self):
         """Test auto-detecting JSON format."""
         filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.json')
@@ -77,6 +159,236 @@ class DatasetLoaderTest(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             load_dataset('/nonexistent/path/file.json')
 
+    def test_load_dataset_cached_copy(self):
+        """Test that repeated loads return independent copies."""
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.json')
+        dataset = load_dataset(filepath)
+        dataset.dis_videos[0]['os']['new_subject'] = 1
+        dataset.dis_videos = dataset.dis_videos[:1]
+        dataset2 = load_dataset(filepath)
+        self.assertIsNot(dataset, dataset2)
+        self.assertEqual(len(dataset2.dis_videos), 3)
+        self.assertNotIn('new_subject', dataset2.dis_videos[0]['os'])
+
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.py')
+        dataset = load_dataset(filepath)
+        dataset.dis_videos[0]['os']['new_subject'] = 1
+        dataset2 = load_dataset(filepath)
+        self.assertIsNot(dataset, dataset2)
+        self.assertNotIn('new_subject', dataset2.dis_videos[0]['os'])
+
+    def test_load_dataset_cached_copy_repetitions(self):
+        """Test that score repetitions are copied along with the dataset."""
+        for filename in ('test_dataset_os_as_dict_with_repetitions.py',
+                         'test_dataset_os_as_list_with_repetitions.json'):
+            filepath = SurealConfig.test_resource_path(filename)
+            dataset = load_dataset(filepath)
+            os_field = dataset.dis_videos[0]['os']
+            scores = os_field['Tom'] if isinstance(os_field, dict) else os_field[0]
+            expected = list(scores)
+            scores.append(99)
+            dataset.ref_videos[0]['path'] = 'changed.yuv'
+            dataset2 = load_dataset(filepath)
+            os_field = dataset2.dis_videos[0]['os']
+            scores = os_field['Tom'] if isinstance(os_field, dict) else os_field[0]
+            self.assertEqual(list(scores), expected)
+            self.assertNotEqual(dataset2.ref_videos[0]['path'], 'changed.yuv')
+
+    def test_load_dataset_cached_copy_shares_os_keys(self):
+        """Test that subject names stay shared across dis_videos when cached."""
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.yaml')
+        load_dataset(filepath)
+        dataset = load_dataset(filepath)
+        keys = [sorted(dis_video['os']) for dis_video in dataset.dis_videos]
+        for key0, key1 in zip(keys[0], keys[1]):
+            self.assertIs(key0, key1)
+
+    def test_load_dataset_cache_invalidated_on_change(self):
+        """Test that a modified file is re-read."""
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.json')
+        dataset = load_dataset(filepath)
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            temp_path = f.name
+
+        try:
+            save_dataset_json(dataset, temp_path)
+            self.assertEqual(len(load_dataset(temp_path).dis_videos), 3)
+            dataset.dis_videos = dataset.dis_videos[:1]
+            save_dataset_json(dataset, temp_path)
+            self.assertEqual(len(load_dataset(temp_path).dis_videos), 1)
+        finally:
+            os.unlink(temp_path)
+            load_dataset.cache_clear()
+
+    def test_load_dataset_soa_layout(self):
+        """Test loading dis_videos column-wise."""
+        filepath = SurealConfig.test_resource_path('NFLX_dataset_public_raw.json')
+        dataset = load_dataset(filepath, layout='soa')
+        self.assertIsInstance(dataset, SoaDataset)
+        self.assertEqual(len(dataset.asset_ids), 79)
+        self.assertEqual(dataset.content_ids[-1], 8)
+        self.assertIsNone(dataset.os_subjects)
+        self.assertEqual(dataset.os_matrix.shape, (79, 26))
+        self.assertEqual(dataset, load_dataset(filepath))
+
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.yaml')
+        dataset = load_dataset(filepath, layout='soa')
+        self.assertEqual(dataset.os_subjects, ('Tom', 'Jerry', 'Pinokio'))
+        self.assertEqual(list(dataset.os_matrix[1]), [2, 1, 3])
+        self.assertEqual(dataset.dis_videos[1]['os'], {'Tom': 2, 'Jerry': 1, 'Pinokio': 3})
+
+        # mixed integer and float scores are kept as they are
+        data = {
+            'ref_videos': [{'content_id': 0, 'path': 'ref.yuv'}],
+            'dis_videos': [{'asset_id': 0, 'content_id': 0, 'path': 'dis.yuv',
+                            'os': [4, 4.5, float('nan')]}],
+        }
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            temp_path = f.name
+        try:
+            save_dataset_json(data, temp_path)
+            dataset = load_dataset(temp_path, layout='soa')
+            self.assertNotIsInstance(dataset, SoaDataset)
+            self.assertIsInstance(dataset.dis_videos[0]['os'][0], int)
+        finally:
+            os.unlink(temp_path)
+            load_dataset.cache_clear()
+
+        # repetitions cannot be stored as a matrix
+        filepath = SurealConfig.test_resource_path(
+            'test_dataset_os_as_list_with_repetitions.json')
+        dataset = load_dataset(filepath, layout='soa')
+        self.assertNotIsInstance(dataset, SoaDataset)
+
+        with self.assertRaises(ValueError):
+            load_dataset(filepath, layout='columns')
+
+    def test_load_dataset_soa_layout_field_clash(self):
+        """Test that top-level fields named like a column are kept."""
+        data = {
+            'subjects': ['alice', 'bob'],
+            'ref_videos': [{'content_id': 0, 'path': 'ref.yuv'}],
+            'dis_videos': [{'asset_id': 0, 'content_id': 0, 'path': 'dis.yuv',
+                            'os': {'a': 4, 'b': 5}}],
+        }
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            temp_path = f.name
+        try:
+            save_dataset_json(data, temp_path)
+            dataset = load_dataset(temp_path, layout='soa')
+            self.assertIsInstance(dataset, SoaDataset)
+            self.assertEqual(dataset.subjects, ['alice', 'bob'])
+            self.assertEqual(vars(dataset)['subjects'], ['alice', 'bob'])
+            self.assertEqual(dataset, load_dataset(temp_path))
+
+            data['paths'] = ['a', 'b']
+            save_dataset_json(data, temp_path)
+            dataset = load_dataset(temp_path, layout='soa')
+            self.assertNotIsInstance(dataset, SoaDataset)
+            self.assertEqual(dataset.paths, ['a', 'b'])
+        finally:
+            os.unlink(temp_path)
+            load_dataset.cache_clear()
+
+    def test_load_dataset_soa_quantized(self):
+        """Test that quantized scores are stored compactly and losslessly."""
+        filepath = SurealConfig.test_resource_path('NFLX_dataset_public_raw.json')
+        dataset = load_dataset(filepath, layout='soa', quantize='auto')
+        self.assertEqual(dataset.os_matrix.dtype, np.int8)
+        self.assertEqual(dataset.os_scores().dtype, np.float64)
+        self.assertEqual(dataset, load_dataset(filepath))
+
+        data = {
+            'ref_videos': [{'content_id': 0, 'path': 'ref.yuv'}],
+            'dis_videos': [
+                {'asset_id': 0, 'content_id': 0, 'path': 'dis0.yuv',
+                 'os': [3.5, float('nan'), 100.0]},
+                {'asset_id': 1, 'content_id': 0, 'path': 'dis1.yuv',
+                 'os': [110.0, 120.5, 100.0]},
+            ],
+        }
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            temp_path = f.name
+        try:
+            save_dataset_json(data, temp_path)
+            dataset = load_dataset(temp_path, layout='soa', quantize='auto')
+            self.assertEqual(dataset.os_matrix.dtype, np.int8)
+            self.assertEqual(dataset.os_scale, 0.5)
+            self.assertNotEqual(dataset.os_offset, 0.0)
+            np.testing.assert_array_equal(
+                dataset.os_scores(),
+                [[3.5, np.nan, 100.0], [110.0, 120.5, 100.0]])
+
+            # out of the float16 range: kept as float64, without a warning
+            data['dis_videos'][1]['os'] = [1e6 + 0.1, 120.5, 100.0]
+            save_dataset_json(data, temp_path)
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                dataset = load_dataset(temp_path, layout='soa', quantize='auto')
+            self.assertEqual(dataset.os_matrix.dtype, np.float64)
+
+            # integers beyond 2 ** 53 are not quantized
+            data['dis_videos'][0]['os'] = [2 ** 60, 2 ** 60 + 1, 2 ** 60 + 2]
+            data['dis_videos'][1]['os'] = [2 ** 60 + 3, 2 ** 60, 2 ** 60]
+            save_dataset_json(data, temp_path)
+            dataset = load_dataset(temp_path, layout='soa', quantize='auto')
+            self.assertEqual(dataset.os_matrix.dtype, np.int64)
+            self.assertEqual(dataset.dis_videos[0]['os'],
+                             [2 ** 60, 2 ** 60 + 1, 2 ** 60 + 2])
+        finally:
+            os.unlink(temp_path)
+            load_dataset.cache_clear()
+
+    def test_load_datasets(self):
+        """Test loading several datasets at once, in order."""
+        filepaths = [
+            SurealConfig.test_resource_path('test_dataset_os_as_dict.json'),
+            SurealConfig.test_resource_path('test_dataset_os_as_dict.yaml'),
+            SurealConfig.test_resource_path('NFLX_dataset_public_raw.json'),
+            SurealConfig.test_resource_path('test_dataset_os_as_dict.py'),
+        ]
+        datasets = load_datasets(filepaths, max_workers=2)
+        self.assertEqual([dataset.dataset_name for dataset in datasets],
+                         ['test_dataset_os_as_dict', 'test_dataset_os_as_dict',
+                          'NFLX_public', 'test_dataset_os_as_dict'])
+        self.assertEqual(load_datasets([]), [])
+        with self.assertRaises(FileNotFoundError):
+            load_datasets(filepaths + ['/nonexistent/path/file.json'])
+
+    def test_load_dataset_header_json(self):
+        """Test loading only the top-level fields of a JSON dataset."""
+        filepath = SurealConfig.test_resource_path('NFLX_dataset_public_raw.json')
+        header = load_dataset_header(filepath)
+        self.assertEqual(header.dataset_name, 'NFLX_public')
+        self.assertEqual(header.ref_score, 5.0)
+        self.assertEqual(header.width, 1920)
+        self.assertEqual(header.num_ref_videos, 9)
+        self.assertEqual(header.num_dis_videos, 79)
+        self.assertFalse(hasattr(header, 'dis_videos'))
+
+        # without orjson the file is streamed (or loaded with json)
+        with patch('sureal.dataset_loader.orjson', None):
+            self.assertEqual(load_dataset_header(filepath), header)
+
+    def test_load_dataset_header_yaml(self):
+        """Test loading only the top-level fields of a YAML dataset."""
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.yaml')
+        header = load_dataset_header(filepath)
+        self.assertEqual(header.dataset_name, 'test_dataset_os_as_dict')
+        self.assertEqual(header.ref_score, 5.0)
+        self.assertEqual(header.height, 1080)
+        self.assertEqual(header.num_ref_videos, 2)
+        self.assertEqual(header.num_dis_videos, 3)
+        self.assertFalse(hasattr(header, 'ref_videos'))
+
+    def test_load_dataset_header_python(self):
+        """Test loading only the top-level fields of a Python dataset."""
+        filepath = SurealConfig.test_resource_path('test_dataset_os_as_dict.py')
+        header = load_dataset_header(filepath)
+        self.assertEqual(header.dataset_name, 'test_dataset_os_as_dict')
+        self.assertEqual(header.num_ref_videos, 2)
+        self.assertEqual(header.num_dis_videos, 3)
+
     def test_validate_dataset_missing_ref_videos(self):
         """Test validation fails without ref_videos."""
         data = {'dis_videos': []}
@@ -98,6 +410,30 @@ class DatasetLoaderTest(unittest.TestCase):
         with self.assertRaises(DatasetValidationError):
             validate_dataset(data)
 
+    def test_validate_dataset_missing_ref_path(self):
+        """Test validation error names the missing ref_video field."""
+        data = {
+            'ref_videos': [{'content_id': 0}],
+            'dis_videos': [{'asset_id': 0, 'content_id': 0, 'path': 'test.yuv',
+                            'os': [4]}]
+        }
+        with self.assertRaisesRegex(DatasetValidationError,
+                                    r"ref_videos\[0\] missing required field 'path'"):
+            validate_dataset(data)
+
+    def test_validate_dataset_invalid_os_type(self):
+        """Test validation error points at the offending dis_video."""
+        data = {
+            'ref_videos': [{'content_id': 0, 'path': 'test.yuv'}],
+            'dis_videos': [
+                {'asset_id': 0, 'content_id': 0, 'path': 'test.yuv', 'os': [4]},
+                {'asset_id': 1, 'content_id': 0, 'path': 'test.yuv', 'os': 4},
+            ]
+        }
+        with self.assertRaisesRegex(DatasetValidationError,
+                                    r"dis_videos\[1\]\['os'\] must be a list"):
+            validate_dataset(data)
+
     def test_save_and_load_json_dataset(self):
         """Test round-trip save and load."""
         # Load original
@@ -119,6 +455,105 @@ class DatasetLoaderTest(unittest.TestCase):
         finally:
             os.unlink(temp_path)
 
+    def test_save_and_load_json_dataset_with_nan(self):
+        """Test that NaN scores survive a JSON round-trip."""
+        data = {
+            'dataset_name': 'test_nan',
+            'ref_videos': [{'content_id': 0, 'path': 'ref.yuv'}],
+            'dis_videos': [{'asset_id': 0, 'content_id': 0, 'path': 'dis.yuv',
+                            'os': [4.0, float('nan'), 5.0]}],
+        }
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            temp_path = f.name
+
+        try:
+            save_dataset_json(data, temp_path)
+            dataset = load_json_dataset(temp_path)
+            os_scores = dataset.dis_videos[0]['os']
+            self.assertEqual(os_scores[0], 4.0)
+            self.assertTrue(math.isnan(os_scores[1]))
+            self.assertEqual(os_scores[2], 5.0)
+        finally:
+            os.unlink(temp_path)
+
+    def test_save_and_load_json_dataset_with_big_int(self):
+        """Test that integers beyond 64 bits survive a JSON round-trip."""
+        data = {
+            'dataset_name': 'test_big_int',
+            'big': 2 ** 70,
+            'ref_videos': [{'content_id': 0, 'path': 'ref.yuv'}],
+            'dis_videos': [{'asset_id': 0, 'content_id': 0, 'path': 'dis.yuv',
+                            'os': [4, 5]}],
+        }
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            temp_path = f.name
+
+        try:
+            save_dataset_json(data, temp_path)
+            dataset = load_json_dataset(temp_path)
+            self.assertEqual(dataset.big, 2 ** 70)
+            self.assertIsInstance(dataset.big, int)
+        finally:
+            os.unlink(temp_path)
+
+    def test_save_and_load_json_dataset_with_null(self):
+        """Test that None values and 'null' strings are kept apart from NaN."""
+        data = {
+            'dataset_name': 'test_null',
+            'comment': None,
+            'ref_videos': [{'content_id': 0, 'path': '/dev/null_ref.yuv'}],
+            'dis_videos': [{'asset_id': 0, 'content_id': 0, 'path': 'dis.yuv',
+                            'os': [4.0, float('inf'), 5.0]}],
+        }
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            temp_path = f.name
+
+        try:
+            save_dataset_json(data, temp_path)
+            dataset = load_json_dataset(temp_path)
+            self.assertIsNone(dataset.comment)
+            self.assertEqual(dataset.ref_videos[0]['path'], '/dev/null_ref.yuv')
+            self.assertEqual(dataset.dis_videos[0]['os'], [4.0, float('inf'), 5.0])
+        finally:
+            os.unlink(temp_path)
+
+    def test_save_dataset_json_skips_non_serializable(self):
+        """Test that non-serializable values are dropped on save."""
+        data = {
+            'dataset_name': 'test_skip',
+            'ref_videos': [{'content_id': 0, 'path': 'ref.yuv'}],
+            'dis_videos': [{'asset_id': 0, 'content_id': 0, 'path': 'dis.yuv',
+                            'os': [4, 5]}],
+            'module_ref': os,
+            'nested_non_serializable': [object()],
+            '_internal': 1,
+        }
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            temp_path = f.name
+
+        try:
+            save_dataset_json(data, temp_path)
+            dataset = load_json_dataset(temp_path)
+            self.assertEqual(dataset.dataset_name, 'test_skip')
+            self.assertFalse(hasattr(dataset, 'module_ref'))
+            self.assertFalse(hasattr(dataset, 'nested_non_serializable'))
+            self.assertFalse(hasattr(dataset, '_internal'))
+
+            # a value json cannot write is dropped whatever else is saved
+            data = {
+                'dataset_name': 'test_skip',
+                'ref_videos': [{'content_id': 0, 'path': 'ref.yuv'}],
+                'dis_videos': [{'asset_id': 0, 'content_id': 0, 'path': 'dis.yuv',
+                                'os': [4, 5]}],
+                'created': [datetime.datetime(2020, 1, 1)],
+            }
+            save_dataset_json(data, temp_path)
+            dataset = load_json_dataset(temp_path)
+            self.assertFalse(hasattr(dataset, 'created'))
+            self.assertEqual(len(dataset.dis_videos), 1)
+        finally:
+            os.unlink(temp_path)
+
     def test_json_and_python_equivalent(self):
         """Test that JSON and Python datasets load equivalently."""
         json_path = SurealConfig.test_resource_path('test_dataset_os_as_dict.json')